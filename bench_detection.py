@@ -0,0 +1,185 @@
+import sys
+import time
+import numpy as np
+import librosa
+from scipy import signal
+from datetime import datetime
+from detection import find_peak, coarse_to_fine_peak, KernelSelector
+from spectral import LogMelStream, template_fingerprint, match_frames
+from whitening import NoiseProfile
+
+# Configuration
+TARGET_FILE = "sounds/target.wav"
+OUT_OF_RANGE_FILE = "sounds/out-of-range.wav"
+BUFFER_DURATION = 3.0  # seconds, same rolling buffer as fishing.py
+COARSE_FACTOR = 8
+COARSE_CANDIDATES = 3
+TRIALS = 50
+SNR_DB_RANGE = (-6.0, 6.0)  # template level relative to the background noise
+HUM_FREQUENCIES = (110.0, 220.0, 330.0)  # tonal background for the whitening comparison
+NOISE_LEARN_DURATION = 5.0  # seconds of background the whitening filter is estimated from
+SHORT_TEMPLATE_DURATION = 0.25  # seconds; cut-down template for the whitening comparison
+
+# A coarse-to-fine result counts as identical to the full search within these
+LAG_TOLERANCE = 0  # samples
+SCORE_TOLERANCE = 1e-6
+
+def log(message):
+    """Print timestamped log messages"""
+    timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+    print(f"[{timestamp}] {message}")
+
+def make_background(rng, length, mix=None):
+    """Ambient-like noise: a (random) mix of white and low-passed (brown-ish) noise"""
+    white = rng.standard_normal(length)
+    brown = np.cumsum(rng.standard_normal(length))
+    brown -= signal.lfilter(np.ones(512) / 512, [1.0], brown)  # remove the drift
+    brown /= np.std(brown) + 1e-10
+    if mix is None:
+        mix = rng.uniform(0.0, 1.0)
+    return (mix * white + (1 - mix) * brown).astype(np.float32)
+
+def make_hum(rng, length, sample_rate):
+    """Mains-like hum: a few low sine tones at random phases, louder than the noise"""
+    t = np.arange(length) / sample_rate
+    return sum(2 * np.sin(2 * np.pi * f * t + rng.uniform(0, 2 * np.pi)) for f in HUM_FREQUENCIES).astype(np.float32)
+
+def make_buffer(rng, template, buffer_len, with_event, background=None):
+    """
+    Background noise (random unless given) with the template mixed in at a random offset and SNR
+    Returns: (buffer, offset or None)
+    """
+    buffer = make_background(rng, buffer_len) if background is None else background
+    if not with_event:
+        return buffer, None
+    offset = int(rng.integers(0, buffer_len - len(template) + 1))
+    snr_db = rng.uniform(*SNR_DB_RANGE)
+    gain = 10 ** (snr_db / 20) * np.std(buffer) / (np.std(template) + 1e-10)
+    buffer[offset:offset + len(template)] += gain * template
+    return buffer, offset
+
+def compare(name, template, sample_rate, rng, kernels):
+    """
+    Run full search (scipy's default correlation) and coarse-to-fine search
+    (auto-selected kernels) on the same buffers; returns True if within tolerance
+    """
+    buffer_len = int(sample_rate * BUFFER_DURATION)
+    full_time = 0.0
+    coarse_time = 0.0
+    worst_lag = 0
+    worst_score = 0.0
+    noise_above = 0
+
+    for trial in range(TRIALS):
+        with_event = trial % 2 == 0
+        buffer, _ = make_buffer(rng, template, buffer_len, with_event)
+
+        start = time.perf_counter()
+        full_score, full_lag = find_peak(buffer, template)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        score, lag = coarse_to_fine_peak(buffer, template, COARSE_FACTOR, COARSE_CANDIDATES, kernels.correlate)
+        coarse_time += time.perf_counter() - start
+
+        if score > full_score + SCORE_TOLERANCE:
+            noise_above += 1
+        if with_event:
+            worst_lag = max(worst_lag, abs(lag - full_lag))
+            worst_score = max(worst_score, abs(score - full_score))
+
+    ok = worst_lag <= LAG_TOLERANCE and worst_score <= SCORE_TOLERANCE and noise_above == 0
+    log(f"{name}: {len(template)} samples in a {buffer_len}-sample buffer")
+    log(f"  Full search:    {full_time / TRIALS * 1000:.2f} ms per buffer")
+    log(f"  Coarse-to-fine: {coarse_time / TRIALS * 1000:.2f} ms per buffer ({full_time / coarse_time:.1f}x faster)")
+    log(f"  Worst lag difference on events:   {worst_lag} samples (tolerance {LAG_TOLERANCE})")
+    log(f"  Worst score difference on events: {worst_score:.2e} (tolerance {SCORE_TOLERANCE:.0e})")
+    log(f"  Buffers scored above the full search: {noise_above}")
+    log(f"  {'✓ PASS' if ok else '✗ FAIL'}")
+    return ok
+
+def spectral_scores(name, template, sample_rate, rng):
+    """Report the spectral engine's scores on events vs. noise, for picking SPECTRAL_THRESHOLD"""
+    buffer_len = int(sample_rate * BUFFER_DURATION)
+    fingerprint = template_fingerprint(template, sample_rate)
+    event_scores = []
+    noise_scores = []
+    match_time = 0.0
+
+    for trial in range(TRIALS):
+        with_event = trial % 2 == 0
+        buffer, _ = make_buffer(rng, template, buffer_len, with_event)
+        stream = LogMelStream(sample_rate)
+        stream.feed(buffer)
+
+        start = time.perf_counter()
+        score, _ = match_frames(stream.frames, fingerprint)
+        match_time += time.perf_counter() - start
+        (event_scores if with_event else noise_scores).append(score)
+
+    log(f"{name} (spectral): {fingerprint.shape[0]} frames x {fingerprint.shape[1]} bands")
+    log(f"  Matching: {match_time / TRIALS * 1000:.2f} ms per buffer")
+    log(f"  Event scores: min {min(event_scores):.3f}, median {np.median(event_scores):.3f}")
+    log(f"  Noise scores: max {max(noise_scores):.3f}, median {np.median(noise_scores):.3f}")
+
+def whitening_scores(name, template, sample_rate, rng):
+    """
+    Waveform scores with and without noise whitening, for a broadband and a
+    humming background, using the full template and a shortened one.
+    Separation = median event score / highest noise-only score.
+    """
+    buffer_len = int(sample_rate * BUFFER_DURATION)
+    learn_len = int(sample_rate * NOISE_LEARN_DURATION)
+    templates = {"full": template}
+    short_len = int(sample_rate * SHORT_TEMPLATE_DURATION)
+    if len(template) > short_len:
+        templates["short"] = template[:short_len]
+    backgrounds = {
+        "broadband": lambda n: make_background(rng, n, mix=0.3),
+        "hum": lambda n: make_background(rng, n, mix=0.3) + make_hum(rng, n, sample_rate),
+    }
+
+    for background_name, background in backgrounds.items():
+        noise = NoiseProfile(sample_rate, NOISE_LEARN_DURATION)
+        noise.add_quiet(background(learn_len))
+        for length_name, tpl in templates.items():
+            whitened_tpl = noise.whiten(tpl)
+            scores = {"raw": ([], []), "whitened": ([], [])}
+            for trial in range(TRIALS):
+                with_event = trial % 2 == 0
+                buffer, _ = make_buffer(rng, tpl, buffer_len, with_event, background(buffer_len))
+                whitened, _ = noise.filter(buffer)
+                scores["raw"][0 if with_event else 1].append(find_peak(buffer, tpl)[0])
+                scores["whitened"][0 if with_event else 1].append(find_peak(whitened, whitened_tpl)[0])
+
+            check_raw, check_whitened = noise.separation(tpl)
+            log(f"{name} (whitening, {background_name} background, {length_name} template: {len(tpl)} samples)")
+            for mode, (events, noises) in scores.items():
+                log(f"  {mode:>8}: events min {min(events):.3f}, median {np.median(events):.3f}; "
+                    f"noise max {max(noises):.3f} → separation {np.median(events) / max(noises):.1f}x")
+            log(f"  Check on the quiet audio: raw {check_raw:.1f}x, whitened {check_whitened:.1f}x "
+                f"→ detector scores this template {'whitened' if check_whitened >= check_raw else 'raw'}")
+
+def main():
+    log("="*60)
+    log("DETECTION BENCHMARK")
+    log("="*60)
+    log(f"Coarse factor: {COARSE_FACTOR}, candidates: {COARSE_CANDIDATES}, trials: {TRIALS}")
+
+    rng = np.random.default_rng(0)
+    kernels = KernelSelector()
+    results = []
+    for name, filename in (("target", TARGET_FILE), ("out_of_range", OUT_OF_RANGE_FILE)):
+        template, sample_rate = librosa.load(filename, sr=None, mono=True)
+        results.append(compare(name, template, sample_rate, rng, kernels))
+        spectral_scores(name, template, sample_rate, rng)
+        whitening_scores(name, template, sample_rate, rng)
+
+    log("Correlation backend timings (* = selected):")
+    for line in kernels.report():
+        log(f"  {line}")
+    log("="*60)
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
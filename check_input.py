@@ -0,0 +1,157 @@
+import sys
+import types
+from datetime import datetime
+
+# DesktopInput only runs on Windows. This script swaps in stand-ins for
+# pyautogui, pywinauto and pywintypes that offer only the calls DesktopInput
+# may use (names as in pywinauto 0.6.x), so a typo or a call to a function the
+# real modules lack fails here instead of on the first cast.
+
+def log(message):
+    """Print timestamped log messages"""
+    timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+    print(f"[{timestamp}] {message}")
+
+class InvalidWindowHandle(Exception):
+    pass
+
+class ElementNotFoundError(Exception):
+    pass
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+class FakeDesktopState:
+    """Shared state of the fake desktop: windows, foreground handle, and every call made"""
+
+    def __init__(self):
+        self.calls = []
+        self.foreground = None
+        self.windows = {}  # title regex -> FakeWindows returned by successive lookups (the last one repeats)
+
+    def lookup(self, title_regex):
+        self.calls.append(("lookup", title_regex))
+        candidates = self.windows.get(title_regex)
+        if not candidates:
+            raise ElementNotFoundError(title_regex)
+        return candidates.pop(0) if len(candidates) > 1 else candidates[0]
+
+class FakeWindow:
+    """Only the HwndWrapper methods DesktopInput is allowed to use"""
+
+    def __init__(self, state, handle, stale=False, broken=False):
+        self._state = state
+        self.handle = handle
+        self.stale = stale
+        self.broken = broken
+
+    def has_focus(self):
+        if self.stale:
+            raise InvalidWindowHandle(self.handle)
+        return self._state.foreground == self.handle
+
+    def set_focus(self):
+        if self.broken:
+            raise ValueError("bug inside set_focus")
+        self._state.calls.append(("set_focus", self.handle))
+        self._state.foreground = self.handle
+
+def install_stubs(state):
+    """Register the stand-in modules in sys.modules"""
+    pyautogui = types.ModuleType("pyautogui")
+    pyautogui.position = lambda: Point(10, 20)
+    pyautogui.moveTo = lambda x, y, duration=0, _pause=True: state.calls.append(("moveTo", x, y, _pause))
+    pyautogui.press = lambda key, _pause=True: state.calls.append(("press", key, _pause))
+
+    pywintypes = types.ModuleType("pywintypes")
+    pywintypes.error = type("error", (Exception,), {})
+
+    class Spec:
+        def __init__(self, title_re):
+            self.title_re = title_re
+
+        def wrapper_object(self):
+            return state.lookup(self.title_re)
+
+    class Desktop:
+        def __init__(self, backend):
+            assert backend == "win32"
+
+        def window(self, title_re):
+            return Spec(title_re)
+
+    pywinauto = types.ModuleType("pywinauto")
+    pywinauto.Desktop = Desktop
+    controls = types.ModuleType("pywinauto.controls")
+    hwndwrapper = types.ModuleType("pywinauto.controls.hwndwrapper")
+    hwndwrapper.InvalidWindowHandle = InvalidWindowHandle
+    findwindows = types.ModuleType("pywinauto.findwindows")
+    findwindows.ElementNotFoundError = ElementNotFoundError
+    pywinauto.controls = controls
+    pywinauto.findwindows = findwindows
+    controls.hwndwrapper = hwndwrapper
+
+    sys.modules.update({
+        "pyautogui": pyautogui,
+        "pywintypes": pywintypes,
+        "pywinauto": pywinauto,
+        "pywinauto.controls": controls,
+        "pywinauto.controls.hwndwrapper": hwndwrapper,
+        "pywinauto.findwindows": findwindows,
+    })
+
+def check(name, ok):
+    log(f"  {'✓ PASS' if ok else '✗ FAIL'}: {name}")
+    return ok
+
+def main():
+    log("="*60)
+    log("INPUT BACKEND CHECK (stubbed pyautogui / pywinauto)")
+    log("="*60)
+
+    state = FakeDesktopState()
+    install_stubs(state)
+    from input_backend import DesktopInput
+    inputs = DesktopInput()
+    results = []
+
+    # Background window: focus it, restore the mouse and press, all without PAUSE
+    state.windows["wow"] = [FakeWindow(state, 1)]
+    state.foreground = 99
+    focused, _ = inputs.focus_and_press("wow", "k")
+    results.append(check("background window is focused", focused and ("set_focus", 1) in state.calls))
+    results.append(check("mouse restored without PAUSE", ("moveTo", 10, 20, False) in state.calls))
+    results.append(check("key pressed without PAUSE", state.calls[-1] == ("press", "k", False)))
+
+    # Window already in front: no second focus, no second lookup
+    state.calls.clear()
+    focused, _ = inputs.focus_and_press("wow", "k")
+    results.append(check("foreground window is not focused again",
+                         not focused and state.calls == [("press", "k", False)]))
+
+    # Stale handle (client restarted): look up again once and carry on
+    state.calls.clear()
+    state.windows["wow"][0].stale = True  # the cached wrapper
+    state.windows["wow"] = [FakeWindow(state, 2)]  # what a new lookup finds
+    focused, _ = inputs.focus_and_press("wow", "k")
+    results.append(check("stale window is looked up again",
+                         focused and state.calls.count(("lookup", "wow")) == 1 and ("set_focus", 2) in state.calls))
+
+    # A bug is not mistaken for a stale window
+    state.calls.clear()
+    state.windows["other"] = [FakeWindow(state, 3, broken=True)]
+    try:
+        inputs.focus_and_press("other", "k")
+        raised = False
+    except ValueError:
+        raised = True
+    results.append(check("other errors propagate without a retry",
+                         raised and state.calls.count(("lookup", "other")) == 1))
+
+    log("="*60)
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import time
+import threading
+import numpy as np
+from collections import deque
+from scipy import signal
+import scipy.fft
+
+def _next_power_of_two(n):
+    return 1 << (int(n) - 1).bit_length()
+
+def correlate_direct(recorded, target):
+    """Time-domain 'valid' correlation"""
+    return np.correlate(recorded, target, mode='valid')
+
+def correlate_numpy_fft(recorded, target):
+    """'valid' correlation through numpy.fft at a power-of-two length"""
+    n = _next_power_of_two(len(recorded))
+    spectrum = np.fft.rfft(recorded, n) * np.conj(np.fft.rfft(target, n))
+    return np.fft.irfft(spectrum, n)[:len(recorded) - len(target) + 1]
+
+def correlate_scipy_fft(recorded, target, workers=-1):
+    """'valid' correlation through scipy.fft at a 5-smooth length, threaded"""
+    n = scipy.fft.next_fast_len(len(recorded), real=True)
+    spectrum = scipy.fft.rfft(recorded, n, workers=workers) * np.conj(scipy.fft.rfft(target, n, workers=workers))
+    return scipy.fft.irfft(spectrum, n, workers=workers)[:len(recorded) - len(target) + 1]
+
+def correlate_overlap_add(recorded, target):
+    """'valid' correlation as overlap-add convolution with the reversed template"""
+    return signal.oaconvolve(recorded, target[::-1], mode='valid')
+
+CORRELATION_BACKENDS = {
+    "direct": correlate_direct,
+    "numpy_fft": correlate_numpy_fft,
+    "scipy_fft": correlate_scipy_fft,
+    "overlap_add": correlate_overlap_add,
+}
+
+def correlate_default(recorded, target):
+    """scipy's own method choice; used when no KernelSelector is given"""
+    return signal.correlate(recorded, target, mode='valid')
+
+class KernelSelector:
+    """
+    Picks the fastest correlation backend per (buffer length, template length).
+    Each new shape is timed once on random data of that shape and the winner
+    is cached; prewarm() does this at startup for the shapes the bot will use.
+    """
+
+    # Skip timing the direct method where it cannot win (multiply-adds per call)
+    DIRECT_LIMIT = 5e7
+
+    def __init__(self, fft_workers=-1, repeats=3):
+        self.repeats = repeats
+        self.timings = {}  # (n, m) -> {backend: seconds}
+        self._choice = {}
+        self._lock = threading.Lock()
+        self._timing_lock = threading.Lock()
+        self._backends = dict(CORRELATION_BACKENDS)
+        self._backends["scipy_fft"] = lambda x, t: correlate_scipy_fft(x, t, workers=fft_workers)
+
+    def _benchmark(self, n, m):
+        rng = np.random.default_rng(0)
+        recorded = rng.standard_normal(n).astype(np.float32)
+        target = rng.standard_normal(m).astype(np.float32)
+        timings = {}
+        for name, backend in self._backends.items():
+            if name == "direct" and (n - m + 1) * m > self.DIRECT_LIMIT:
+                continue
+            best = float("inf")
+            for _ in range(self.repeats):
+                start = time.perf_counter()
+                backend(recorded, target)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        return timings
+
+    def choose(self, n, m):
+        """Name of the fastest backend for this shape (timed on first use)"""
+        key = (n, m)
+        choice = self._choice.get(key)
+        if choice is None:
+            # One shape is timed at a time: concurrent benchmarks (two templates,
+            # several sessions) would compete for the same cores and skew the choice
+            with self._timing_lock:
+                choice = self._choice.get(key)
+                if choice is None:
+                    timings = self._benchmark(n, m)
+                    choice = min(timings, key=timings.get)
+                    with self._lock:
+                        self.timings[key] = timings
+                        self._choice[key] = choice
+        return choice
+
+    def prewarm(self, shapes):
+        """Time every shape not seen yet; returns the shapes that were timed now"""
+        new_shapes = [shape for shape in dict.fromkeys(shapes) if shape not in self._choice]
+        for n, m in new_shapes:
+            self.choose(n, m)
+        return new_shapes
+
+    def correlate(self, recorded, target):
+        return self._backends[self.choose(len(recorded), len(target))](recorded, target)
+
+    def kernel(self, backend="auto"):
+        """Correlation callable: the auto-selecting one, or a fixed backend by name"""
+        if backend == "auto":
+            return self.correlate
+        return self._backends[backend]
+
+    def report(self, shapes=None):
+        """One line per measured shape (or per given shape): timing of every backend, winner marked"""
+        lines = []
+        with self._lock:
+            for (n, m), timings in sorted(self.timings.items()):
+                if shapes is not None and (n, m) not in shapes:
+                    continue
+                cells = ", ".join(
+                    f"{'*' if name == self._choice[(n, m)] else ''}{name} {seconds * 1000:.2f}ms"
+                    for name, seconds in sorted(timings.items(), key=lambda item: item[1])
+                )
+                lines.append(f"{n} x {m}: {cells}")
+        return lines
+
+def normalize_audio(audio):
+    """Normalize audio to prevent amplitude differences"""
+    if np.max(np.abs(audio)) > 0:
+        return audio / np.max(np.abs(audio))
+    return audio
+
+def _score_scale(recorded_norm, target_norm):
+    """Divisor turning a raw correlation value into the detection score"""
+    return len(target_norm) * np.std(recorded_norm) * np.std(target_norm) + 1e-10
+
+def find_peak(recorded_audio, target_audio, correlate=correlate_default):
+    """
+    Full-rate search over every lag
+    Returns: (score, lag) where lag is the sample offset of the template in the buffer
+    """
+    recorded_norm = normalize_audio(recorded_audio)
+    target_norm = normalize_audio(target_audio)
+
+    correlation = np.abs(correlate(recorded_norm, target_norm))
+    correlation /= _score_scale(recorded_norm, target_norm)
+    lag = int(np.argmax(correlation))
+    return float(correlation[lag]), lag
+
+def decimate_mean(audio, factor):
+    """Downsample by averaging blocks of `factor` samples (a cheap boxcar low-pass)"""
+    usable = len(audio) - len(audio) % factor
+    return audio[:usable].reshape(-1, factor).mean(axis=1)
+
+def _coarse_candidates(coarse, count, spacing):
+    """Indices of the `count` highest coarse peaks, at least `spacing` bins apart"""
+    picks = []
+    for index in np.argsort(coarse)[::-1]:
+        if all(abs(index - p) > spacing for p in picks):
+            picks.append(int(index))
+            if len(picks) == count:
+                break
+    return picks
+
+def search_shapes(buffer_len, template_len, factor=1):
+    """(buffer, template) lengths passed to the correlation kernel by one search"""
+    if factor <= 1 or template_len // factor < 16:
+        return [(buffer_len, template_len)]
+    last_lag = buffer_len - template_len
+    return [
+        (buffer_len // factor, template_len // factor),
+        (min(last_lag, 4 * factor) + template_len, template_len),
+    ]
+
+def coarse_to_fine_peak(recorded_audio, target_audio, factor=8, candidates=3, correlate=correlate_default):
+    """
+    Two-level search: correlate block-averaged copies to propose a few lags,
+    then score only small windows around them at full rate.
+    Scores are computed exactly like find_peak(), just at fewer lags, so the
+    result can only be lower than the full search, never higher.
+    Returns: (score, lag)
+    """
+    coarse_template_len = len(target_audio) // factor
+    if factor <= 1 or coarse_template_len < 16:
+        # Too short to survive decimation - not worth a second level
+        return find_peak(recorded_audio, target_audio, correlate)
+
+    recorded_norm = normalize_audio(recorded_audio)
+    target_norm = normalize_audio(target_audio)
+    scale = _score_scale(recorded_norm, target_norm)
+
+    # Level 1: one correlation over factor-times fewer samples and lags
+    coarse = np.abs(correlate(decimate_mean(recorded_norm, factor), decimate_mean(target_norm, factor)))
+    picks = _coarse_candidates(coarse, candidates, spacing=2)
+
+    # Level 2: exact scores within two coarse bins of each candidate. Windows
+    # near the buffer edges are shifted inward rather than cut, so every
+    # refine call has the same shape.
+    last_lag = len(recorded_norm) - len(target_norm)
+    radius = 2 * factor
+    span = min(last_lag, 2 * radius)
+    best_score, best_lag = 0.0, 0
+    for pick in picks:
+        lo = min(max(0, pick * factor - radius), last_lag - span)
+        window = recorded_norm[lo:lo + span + len(target_norm)]
+        fine = np.abs(correlate(window, target_norm))
+        index = int(np.argmax(fine))
+        if fine[index] / scale > best_score:
+            best_score, best_lag = float(fine[index] / scale), lo + index
+    return best_score, best_lag
+
+def detect_sound_in_buffer(recorded_audio, target_audio, threshold=0.6, coarse_factor=1, coarse_candidates=3,
+                           correlate=correlate_default):
+    """
+    Use cross-correlation to detect if target sound is in recorded audio
+    coarse_factor > 1 switches to the coarse-to-fine search
+    Returns: (found, correlation_score)
+    """
+    if len(recorded_audio) < len(target_audio):
+        return False, 0.0
+
+    if coarse_factor > 1:
+        peak_value, _ = coarse_to_fine_peak(recorded_audio, target_audio, coarse_factor, coarse_candidates, correlate)
+    else:
+        peak_value, _ = find_peak(recorded_audio, target_audio, correlate)
+
+    return peak_value >= threshold, peak_value
+
+class WaveformDetector:
+    """
+    Detection engine correlating raw samples against the template waveforms,
+    over a rolling buffer of the most recent audio.
+    """
+
+    def __init__(self, templates, sample_rate, threshold, buffer_duration, coarse_factor=1, coarse_candidates=3,
+                 correlate=correlate_default):
+        self.templates = templates
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.search = {"coarse_factor": coarse_factor, "coarse_candidates": coarse_candidates, "correlate": correlate}
+        self.buffer = deque(maxlen=int(sample_rate * buffer_duration))
+
+    @property
+    def buffered(self):
+        """Seconds of audio currently held"""
+        return len(self.buffer) / self.sample_rate
+
+    def feed(self, chunk):
+        self.buffer.extend(chunk)
+
+    def submit(self, pool):
+        """Queue scoring of every template that fits in the buffer; returns {name: future}"""
+        buffer_array = np.array(self.buffer)
+        return {
+            name: pool.submit(detect_sound_in_buffer, buffer_array, audio, self.threshold, **self.search)
+            for name, audio in self.templates.items()
+            if len(buffer_array) >= len(audio)
+        }
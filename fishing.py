@@ -1,14 +1,22 @@
-import pyaudiowpatch as pyaudio
 import numpy as np
-from scipy import signal
 import librosa
-import pyautogui
 import time
 import random
-from pywinauto import Desktop
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from collections import deque
 import yaml
+from detection import WaveformDetector, KernelSelector, CORRELATION_BACKENDS, search_shapes
+from spectral import SpectralDetector, template_fingerprint
+from whitening import NoiseProfile, WhiteningDetector, filter_taps
+from stats import SessionStats, AdaptiveSchedule
+from input_backend import DesktopInput
+
+DETECTION_ENGINES = ["waveform", "spectral"]
+
+# Keys a SESSIONS entry may override; anything missing falls back to the top-level value
+SESSION_KEYS = ["NAME", "OUTPUT_DEVICE_INDEX", "WOW_TITLE_REGEX", "ACTION_KEY", "LURE_KEY", "USE_LURE"]
 
 def load_settings(path="settings.yaml"):
     with open(path, "r", encoding="utf-8") as f:
@@ -53,37 +61,85 @@ def load_settings(path="settings.yaml"):
     cfg["TARGET_FILE"] = str(cfg["TARGET_FILE"])
     cfg["OUT_OF_RANGE_FILE"] = str(cfg["OUT_OF_RANGE_FILE"])
     cfg["USE_LURE"] = bool(cfg["USE_LURE"])
+    cfg["DETECTION_ENGINE"] = str(cfg.get("DETECTION_ENGINE", "waveform")).lower()
+    if cfg["DETECTION_ENGINE"] not in DETECTION_ENGINES:
+        raise ValueError(f"DETECTION_ENGINE must be one of {DETECTION_ENGINES}, got: {cfg['DETECTION_ENGINE']!r}")
+    cfg["SPECTRAL_THRESHOLD"] = float(cfg.get("SPECTRAL_THRESHOLD", 0.4))
+    cfg["CORRELATION_BACKEND"] = str(cfg.get("CORRELATION_BACKEND", "auto")).lower()
+    backends = ["auto"] + list(CORRELATION_BACKENDS)
+    if cfg["CORRELATION_BACKEND"] not in backends:
+        raise ValueError(f"CORRELATION_BACKEND must be one of {backends}, got: {cfg['CORRELATION_BACKEND']!r}")
+    cfg["COARSE_FACTOR"] = int(cfg.get("COARSE_FACTOR", 8))
+    cfg["COARSE_CANDIDATES"] = int(cfg.get("COARSE_CANDIDATES", 3))
+    if cfg["COARSE_FACTOR"] < 1 or cfg["COARSE_CANDIDATES"] < 1:
+        raise ValueError("COARSE_FACTOR and COARSE_CANDIDATES must be >= 1")
+    cfg["WHITENING"] = bool(cfg.get("WHITENING", False))
+    cfg["WHITENED_THRESHOLD"] = float(cfg.get("WHITENED_THRESHOLD", 0.6))
+    cfg["WHITENING_UPDATE_SECONDS"] = float(cfg.get("WHITENING_UPDATE_SECONDS", 5.0))
+    if cfg["WHITENING_UPDATE_SECONDS"] <= 0:
+        raise ValueError(f"WHITENING_UPDATE_SECONDS must be > 0, got: {cfg['WHITENING_UPDATE_SECONDS']!r}")
+    cfg["ADAPTIVE_TIMING"] = bool(cfg.get("ADAPTIVE_TIMING", False))
+    cfg["ADAPTIVE_LISTEN_PERCENTILE"] = float(cfg.get("ADAPTIVE_LISTEN_PERCENTILE", 95))
+    cfg["ADAPTIVE_LISTEN_MARGIN"] = float(cfg.get("ADAPTIVE_LISTEN_MARGIN", 1.0))
+    cfg["ADAPTIVE_MIN_SAMPLES"] = int(cfg.get("ADAPTIVE_MIN_SAMPLES", 20))
+    cfg["ADAPTIVE_PROBE_EVERY"] = int(cfg.get("ADAPTIVE_PROBE_EVERY", 10))
+    if not 0 < cfg["ADAPTIVE_LISTEN_PERCENTILE"] <= 100:
+        raise ValueError(f"ADAPTIVE_LISTEN_PERCENTILE must be in (0, 100], got: {cfg['ADAPTIVE_LISTEN_PERCENTILE']!r}")
+    if cfg["ADAPTIVE_LISTEN_MARGIN"] < 0 or cfg["ADAPTIVE_MIN_SAMPLES"] < 1 or cfg["ADAPTIVE_PROBE_EVERY"] < 0:
+        raise ValueError("ADAPTIVE_LISTEN_MARGIN must be >= 0, ADAPTIVE_MIN_SAMPLES >= 1, ADAPTIVE_PROBE_EVERY >= 0")
+    workers = cfg.get("DETECTION_WORKERS")
+    cfg["DETECTION_WORKERS"] = min(4, os.cpu_count() or 1) if workers is None else int(workers)
+    if cfg["DETECTION_WORKERS"] < 1:
+        raise ValueError(f"DETECTION_WORKERS must be >= 1, got: {cfg['DETECTION_WORKERS']!r}")
 
-    return cfg
-
-# Set global settings from YAML file
-SETTINGS = load_settings("settings.yaml")
+    # Optional list of game clients driven by this process. Without it, the
+    # top-level keys describe a single session.
+    entries = cfg.get("SESSIONS") or [{}]
+    if not isinstance(entries, list):
+        raise ValueError(f"SESSIONS must be a list of mappings, got: {entries!r}")
+    sessions = []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValueError(f"SESSIONS[{i}] must be a mapping, got: {entry!r}")
+        unknown = [k for k in entry if k not in SESSION_KEYS]
+        if unknown:
+            raise KeyError(f"Unknown keys in SESSIONS[{i}]: {', '.join(unknown)}")
+        sessions.append({
+            "NAME": str(entry.get("NAME", f"session-{i + 1}")),
+            "OUTPUT_DEVICE_INDEX": int(entry.get("OUTPUT_DEVICE_INDEX", cfg["OUTPUT_DEVICE_INDEX"])),
+            "WOW_TITLE_REGEX": str(entry.get("WOW_TITLE_REGEX", cfg["WOW_TITLE_REGEX"])),
+            "ACTION_KEY": str(entry.get("ACTION_KEY", cfg["ACTION_KEY"])),
+            "LURE_KEY": str(entry.get("LURE_KEY", cfg["LURE_KEY"])),
+            "USE_LURE": bool(entry.get("USE_LURE", cfg["USE_LURE"])),
+        })
+    # Sharing a device means hearing the other client's splash; sharing a
+    # window regex means pressing keys in the other client
+    for key in ("NAME", "OUTPUT_DEVICE_INDEX", "WOW_TITLE_REGEX"):
+        values = [sess[key] for sess in sessions]
+        if len(set(values)) != len(values):
+            raise ValueError(f"SESSIONS {key} values must be unique, got: {values!r}")
+    cfg["SESSIONS"] = sessions
 
-WOW_TITLE_REGEX = SETTINGS["WOW_TITLE_REGEX"]
-TARGET_FILE = SETTINGS["TARGET_FILE"]
-OUT_OF_RANGE_FILE = SETTINGS["OUT_OF_RANGE_FILE"]
-OUTPUT_DEVICE_INDEX = SETTINGS["OUTPUT_DEVICE_INDEX"]
-THRESHOLD = SETTINGS["THRESHOLD"]
-
-WAIT_AFTER_NOT_FOUND = SETTINGS["WAIT_AFTER_NOT_FOUND"]
-WAIT_AFTER_TARGET_FOUND = SETTINGS["WAIT_AFTER_TARGET_FOUND"]
-WAIT_AFTER_OUT_OF_RANGE = SETTINGS["WAIT_AFTER_OUT_OF_RANGE"]
-
-ACTION_KEY = SETTINGS["ACTION_KEY"]
-LURE_KEY = SETTINGS["LURE_KEY"]
+    return cfg
 
-USE_LURE = SETTINGS["USE_LURE"]
+SETTINGS_FILE = "settings.yaml"
 
 # Script-owned config (not in YAML)
 LISTEN_DURATION = 23  # seconds
 CHUNK_DURATION = 0.3  # Process audio every 0.3 seconds for faster response
+BUFFER_DURATION = 3.0  # seconds of audio searched on every check
 LURE_COOLDOWN_SECONDS = 10 * 60 + 10 # 10 minutes 6 seconds
 LURE_WAIT_TIME = (5.1, 5.5)
+STATS_REPORT_EVERY = 25  # cycles between throughput reports
 
 def log(message):
-    """Print timestamped log messages"""
+    """Print timestamped log messages, tagged with the session name when run from a session thread"""
     timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-    print(f"[{timestamp}] {message}")
+    thread_name = threading.current_thread().name
+    if thread_name != "MainThread":
+        print(f"[{timestamp}] [{thread_name}] {message}")
+    else:
+        print(f"[{timestamp}] {message}")
 
 def load_target_audio(filename):
     """Load the target audio file"""
@@ -92,44 +148,238 @@ def load_target_audio(filename):
     log(f"  Loaded: {len(target_audio)} samples, sample rate: {sr} Hz, duration: {len(target_audio)/sr:.3f}s")
     return target_audio, sr
 
-def normalize_audio(audio):
-    """Normalize audio to prevent amplitude differences"""
-    if np.max(np.abs(audio)) > 0:
-        return audio / np.max(np.abs(audio))
-    return audio
+def file_stamp(path):
+    """Modification time of a file, or None if it does not exist (yet)"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
 
-def detect_sound_in_buffer(recorded_audio, target_audio, threshold=0.6):
+class TemplateStore:
     """
-    Use cross-correlation to detect if target sound is in recorded audio
-    Returns: (found, correlation_score)
+    Target/out-of-range templates shared by all sessions.
+    Files are loaded once; resampled copies are cached per device sample rate.
+    reload() re-reads only the templates whose file changed and drops only their caches.
     """
-    if len(recorded_audio) < len(target_audio):
-        return False, 0.0
-    
-    # Normalize both signals
-    recorded_norm = normalize_audio(recorded_audio)
-    target_norm = normalize_audio(target_audio)
-    
-    # Perform cross-correlation
-    correlation = signal.correlate(recorded_norm, target_norm, mode='valid')
-    
-    # Normalize correlation
-    if len(correlation) > 0:
-        correlation = correlation / (len(target_norm) * np.std(recorded_norm) * np.std(target_norm) + 1e-10)
-        peak_value = np.max(np.abs(correlation))
-        
-        if peak_value >= threshold:
-            return True, peak_value
-        return False, peak_value
-    
-    return False, 0.0
 
-def press_key(key):
-    """Press a keyboard key with logging"""
-    log(f">> PRESSING KEY: '{key}' <<")
-    pyautogui.press(key)
-    time.sleep(0.1)
-    log(f"Key '{key}' pressed successfully")
+    def __init__(self, target_file, out_of_range_file):
+        self._lock = threading.Lock()
+        self._files = {}
+        self._cache = {}
+        self.sample_rate = None
+        self.reload(target_file, out_of_range_file)
+
+    def reload(self, target_file, out_of_range_file):
+        """Load any template whose path or modification time changed. Returns the names reloaded."""
+        wanted = {"target": target_file, "out_of_range": out_of_range_file}
+        stamps = {name: (path, file_stamp(path)) for name, path in wanted.items()}
+        changed = [name for name, stamp in stamps.items() if self._files.get(name) != stamp]
+        if not changed:
+            return []
+
+        # Decode outside the lock so sessions keep detecting with the old templates meanwhile
+        loaded = {name: load_target_audio(wanted[name]) for name in changed}
+
+        with self._lock:
+            # The target file defines the working sample rate; if it moves, every
+            # resampled copy is stale, including the out-of-range template's
+            sample_rate = loaded["target"][1] if "target" in loaded else self.sample_rate
+            if sample_rate != self.sample_rate and "out_of_range" not in loaded:
+                loaded["out_of_range"] = load_target_audio(wanted["out_of_range"])
+                changed.append("out_of_range")
+
+            for name, (audio, sr) in loaded.items():
+                # Ensure both files have the same sample rate
+                if sr != sample_rate:
+                    log(f"WARNING: Sample rates differ! Target: {sample_rate} Hz, {name}: {sr} Hz")
+                    log(f"Resampling {name} audio to {sample_rate} Hz...")
+                    audio = librosa.resample(audio, orig_sr=sr, target_sr=sample_rate)
+                    log(f"Resampling complete")
+                self._cache = {key: value for key, value in self._cache.items() if key[0] != name}
+                self._cache[(name, sample_rate)] = audio
+                self._files[name] = stamps[name]
+            self.sample_rate = sample_rate
+        return changed
+
+    def _resampled(self, name, sample_rate):
+        key = (name, sample_rate)
+        if key not in self._cache:
+            log(f"Resampling {name} template from {self.sample_rate} Hz to {sample_rate} Hz...")
+            self._cache[key] = librosa.resample(
+                self._cache[(name, self.sample_rate)], orig_sr=self.sample_rate, target_sr=sample_rate
+            )
+        return self._cache[key]
+
+    def get(self, sample_rate):
+        """Return (target_audio, out_of_range_audio) at the given sample rate"""
+        with self._lock:
+            return self._resampled("target", sample_rate), self._resampled("out_of_range", sample_rate)
+
+    def derived(self, kind, sample_rate, build):
+        """
+        Return {name: build(audio, sample_rate)} for both templates.
+        Cached per sample rate until that template is reloaded.
+        """
+        with self._lock:
+            result = {}
+            for name in ("target", "out_of_range"):
+                key = (name, sample_rate, kind)
+                if key not in self._cache:
+                    self._cache[key] = build(self._resampled(name, sample_rate), sample_rate)
+                result[name] = self._cache[key]
+            return result
+
+def make_detector(settings, templates, kernels, sample_rate, noise=None):
+    """
+    Build the detection engine selected by DETECTION_ENGINE for one listen cycle
+    noise: the session's NoiseProfile at this sample rate, used when WHITENING is on
+    """
+    if settings["DETECTION_ENGINE"] == "spectral":
+        return SpectralDetector(
+            templates.derived("logmel", sample_rate, template_fingerprint),
+            sample_rate, settings["SPECTRAL_THRESHOLD"], BUFFER_DURATION,
+        )
+    target_audio, out_of_range_audio = templates.get(sample_rate)
+    waveforms = {"target": target_audio, "out_of_range": out_of_range_audio}
+    search = {
+        "coarse_factor": settings["COARSE_FACTOR"],
+        "coarse_candidates": settings["COARSE_CANDIDATES"],
+        "correlate": kernels.kernel(settings["CORRELATION_BACKEND"]),
+    }
+    if settings["WHITENING"] and noise is not None:
+        return WhiteningDetector(
+            waveforms, noise, sample_rate, settings["THRESHOLD"], settings["WHITENED_THRESHOLD"], BUFFER_DURATION,
+            **search,
+        )
+    return WaveformDetector(waveforms, sample_rate, settings["THRESHOLD"], BUFFER_DURATION, **search)
+
+def prewarm_kernels(settings, templates, kernels, sample_rate=None):
+    """
+    Time the correlation backends for every shape a waveform listen cycle uses
+    at `sample_rate` (default: the templates' rate); the buffer grows chunk by
+    chunk, then stays full. Returns the shapes that had not been timed before.
+    """
+    sample_rate = sample_rate or templates.sample_rate
+    chunk_samples = int(sample_rate * CHUNK_DURATION)
+    max_buffer_samples = int(sample_rate * BUFFER_DURATION)
+    buffer_lengths = sorted({min(k * chunk_samples, max_buffer_samples)
+                             for k in range(1, max_buffer_samples // chunk_samples + 2)})
+    # Whitened templates carry the FIR's tail; raw ones are used until the first noise estimate
+    extras = [0, filter_taps(sample_rate) - 1] if settings["WHITENING"] else [0]
+    shapes = []
+    for template in templates.get(sample_rate):
+        for extra in extras:
+            template_len = len(template) + extra
+            for buffer_len in buffer_lengths:
+                if buffer_len >= template_len:
+                    shapes.extend(search_shapes(buffer_len, template_len, settings["COARSE_FACTOR"]))
+    return kernels.prewarm(shapes)
+
+class ConfigWatcher:
+    """
+    Watches settings.yaml and the template files it points at.
+    poll() runs between cycles: a changed settings file is re-validated with
+    load_settings() and swapped in as a whole, changed sound files are reloaded
+    into the TemplateStore. Anything that fails to load is logged and the
+    previous values stay active.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = file_stamp(path)
+        self.settings = load_settings(path)
+        self.templates = TemplateStore(self.settings["TARGET_FILE"], self.settings["OUT_OF_RANGE_FILE"])
+
+    def poll(self):
+        """Pick up changed files; returns the settings dict to use for the next cycle"""
+        with self._lock:
+            stamp = file_stamp(self.path)
+            if stamp is not None and stamp != self._stamp:
+                self._stamp = stamp
+                self._reload_settings()
+            try:
+                changed = self.templates.reload(self.settings["TARGET_FILE"], self.settings["OUT_OF_RANGE_FILE"])
+            except Exception as e:
+                log(f"WARNING: Could not reload templates, keeping the previous ones: {e}")
+            else:
+                if changed:
+                    log(f"♻ Reloaded templates: {', '.join(changed)}")
+            return self.settings
+
+    def _reload_settings(self):
+        try:
+            settings = load_settings(self.path)
+        except Exception as e:
+            log(f"WARNING: Invalid {self.path}, keeping the previous settings: {e}")
+            return
+
+        old_names = [sess["NAME"] for sess in self.settings["SESSIONS"]]
+        new_names = [sess["NAME"] for sess in settings["SESSIONS"]]
+        if new_names != old_names:
+            log(f"WARNING: SESSIONS changed from {old_names} to {new_names}; restart to add or remove sessions")
+            # Keep the running sessions; renamed/new entries only take effect after a restart
+            known = {sess["NAME"]: sess for sess in settings["SESSIONS"]}
+            settings["SESSIONS"] = [known.get(sess["NAME"], sess) for sess in self.settings["SESSIONS"]]
+        if settings["DETECTION_WORKERS"] != self.settings["DETECTION_WORKERS"]:
+            log("WARNING: DETECTION_WORKERS changed; restart to resize the detection pool")
+
+        changed = [k for k in settings if settings[k] != self.settings.get(k)]
+        self.settings = settings
+        log(f"♻ Reloaded {self.path}: {', '.join(changed) if changed else 'no changes'}")
+
+def find_session(settings, name):
+    """Return the SESSIONS entry with the given name"""
+    for session in settings["SESSIONS"]:
+        if session["NAME"] == name:
+            return session
+    raise KeyError(f"No session named {name!r}")
+
+class Clock:
+    """Wall-clock time for cycle timing and waits. The simulator substitutes a virtual clock."""
+
+    def time(self):
+        return time.time()
+
+    def wait(self, stop_event, seconds):
+        """Sleep, returning early when stop_event is set"""
+        stop_event.wait(seconds)
+
+class Runtime:
+    """
+    Process-wide resources shared by all sessions: settings/templates, the
+    audio API, the input backend, the detection pool and correlation kernels.
+    `audio` is a pyaudio.PyAudio, or a stand-in with the same
+    get_device_info_by_index/get_format_from_width/open methods.
+    """
+
+    def __init__(self, config, audio, inputs, clock=None):
+        self.config = config
+        self.audio = audio
+        self.inputs = inputs
+        self.clock = clock or Clock()
+        self.stop_event = threading.Event()
+        # PortAudio must not open or close streams from several threads at once
+        self.audio_lock = threading.Lock()
+
+        settings = config.settings
+        workers = settings["DETECTION_WORKERS"]
+        log(f"Detection workers: {workers}")
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detect")
+
+        # Split the cores between pool workers rather than letting each FFT grab them all
+        self.kernels = KernelSelector(fft_workers=max(1, (os.cpu_count() or 1) // workers))
+        if settings["DETECTION_ENGINE"] == "waveform":
+            log("Timing correlation backends for the buffer/template sizes in use...")
+            prewarm_kernels(settings, config.templates, self.kernels)
+            for line in self.kernels.report():
+                log(f"  {line}")
+            if settings["CORRELATION_BACKEND"] != "auto":
+                log(f"  (CORRELATION_BACKEND override active: always using {settings['CORRELATION_BACKEND']})")
+
+    def close(self):
+        self.stop_event.set()
+        self.pool.shutdown(wait=True)
 
 def random_wait(wait_range):
     """Wait for a random amount of time within the given range"""
@@ -137,20 +387,43 @@ def random_wait(wait_range):
     wait_time = random.uniform(min_wait, max_wait)
     return wait_time
 
-def focus_wow_window():
-    """Focus WoW window without moving the mouse permanently."""
-    pos = pyautogui.position()
-    Desktop(backend="win32").window(title_re=WOW_TITLE_REGEX).set_focus()
-    pyautogui.moveTo(pos.x, pos.y, duration=0)
+def focus_and_press(inputs, session, key):
+    """
+    Focus the session's WoW window and press a key with logging
+    Returns: time.perf_counter() right after the key press
+    """
+    log(f">> PRESSING KEY: '{key}' <<")
+    focused, pressed_at = inputs.focus_and_press(session["WOW_TITLE_REGEX"], key)
+    if focused:
+        log(f"Set WoW as the active application")
+    log(f"Key '{key}' pressed successfully")
+    return pressed_at
 
-def record_and_detect_realtime(p, device_index, target_audio, out_of_range_audio, sample_rate, max_duration):
+def close_stream(runtime, stream):
+    """Stop and close a capture stream (serialized with every other session's open/close)"""
+    with runtime.audio_lock:
+        stream.stop_stream()
+        stream.close()
+
+def record_and_detect_realtime(runtime, settings, session, max_duration, noise_profiles):
     """
     Record audio in chunks and detect target sounds in real-time
-    Returns: (detection_type, elapsed_time)
+    noise_profiles: the session's {sample_rate: NoiseProfile}, kept across cycles
+    Returns: (detection_type, elapsed_time, detected_at) where detected_at is the
+    time.perf_counter() of the detection, or None
     """
+    p = runtime.audio
+    clock = runtime.clock
+    stop_event = runtime.stop_event
+    templates = runtime.config.templates
+    device_index = session["OUTPUT_DEVICE_INDEX"]
+    action_key = session["ACTION_KEY"]
+    sample_rate = templates.sample_rate
+
     log(f"Opening audio stream on device index {device_index}...")
     
-    device_info = p.get_device_info_by_index(device_index)
+    with runtime.audio_lock:
+        device_info = p.get_device_info_by_index(device_index)
     device_channels = device_info['maxInputChannels']
     
     log(f"Recording from: {device_info['name']}")
@@ -158,10 +431,6 @@ def record_and_detect_realtime(p, device_index, target_audio, out_of_range_audio
     
     chunk_samples = int(sample_rate * CHUNK_DURATION)
     
-    buffer_duration = 3.0
-    max_buffer_samples = int(sample_rate * buffer_duration)
-    audio_buffer = deque(maxlen=max_buffer_samples)
-    
     # Try multiple sample rates (NVIDIA devices often need this)
     sample_rates_to_try = [
         int(sample_rate),      # Try requested first
@@ -179,14 +448,15 @@ def record_and_detect_realtime(p, device_index, target_audio, out_of_range_audio
     for sr in sample_rates_to_try:
         try:
             log(f"Trying sample rate: {sr} Hz...")
-            stream = p.open(
-                format=pyaudio.paInt16,
-                channels=device_channels,
-                rate=sr,
-                input=True,
-                input_device_index=device_index,
-                frames_per_buffer=int(sr * CHUNK_DURATION)
-            )
+            with runtime.audio_lock:
+                stream = p.open(
+                    format=p.get_format_from_width(2),  # 16-bit samples
+                    channels=device_channels,
+                    rate=sr,
+                    input=True,
+                    input_device_index=device_index,
+                    frames_per_buffer=int(sr * CHUNK_DURATION)
+                )
             working_sample_rate = sr
             log(f"✓ Success with sample rate: {sr} Hz")
             break
@@ -196,64 +466,76 @@ def record_and_detect_realtime(p, device_index, target_audio, out_of_range_audio
     
     if stream is None or working_sample_rate is None:
         log(f"ERROR: Could not open audio stream with any sample rate")
-        return None, 0
+        return None, 0, None
     
-    # If we had to use a different sample rate, resample the target audio
+    # If we had to use a different sample rate, resize the chunks
     if working_sample_rate != sample_rate:
-        log(f"Resampling target audio from {sample_rate} Hz to {working_sample_rate} Hz...")
-        import librosa
-        target_audio = librosa.resample(target_audio, orig_sr=sample_rate, target_sr=working_sample_rate)
-        out_of_range_audio = librosa.resample(out_of_range_audio, orig_sr=sample_rate, target_sr=working_sample_rate)
         sample_rate = working_sample_rate
-        
-        # Recalculate buffer sizes
         chunk_samples = int(sample_rate * CHUNK_DURATION)
-        max_buffer_samples = int(sample_rate * buffer_duration)
-        audio_buffer = deque(maxlen=max_buffer_samples)
+    
+    # Time the kernels for this rate before the cast, not inside the first detection jobs
+    # (loopback devices often reject the templates' rate)
+    if settings["DETECTION_ENGINE"] == "waveform":
+        timed = prewarm_kernels(settings, templates, runtime.kernels, sample_rate)
+        if timed:
+            log(f"Timed correlation backends for {sample_rate} Hz:")
+            for line in runtime.kernels.report(timed):
+                log(f"  {line}")
+    
+    # Shared templates at the rate the device accepted (prepared once per rate, not per cycle)
+    noise = noise_profiles.get(sample_rate)
+    if noise is None:
+        noise = noise_profiles[sample_rate] = NoiseProfile(sample_rate, settings["WHITENING_UPDATE_SECONDS"])
+    noise.update_duration = settings["WHITENING_UPDATE_SECONDS"]
+    detector = make_detector(settings, templates, runtime.kernels, sample_rate, noise)
+    if isinstance(detector, WhiteningDetector):
+        if noise.fir is None:
+            log("Whitening: learning the background noise (detecting unwhitened meanwhile)")
+        else:
+            log(f"Whitening: noise profile update #{noise.version}")
     
     log(f"Audio stream ACTIVE - ready to capture immediate sounds")
     log(f"Final sample rate: {sample_rate} Hz")
     
-    log(f"Setting WoW as the active application")
-    focus_wow_window()
-    
-    press_key(ACTION_KEY)
+    focus_and_press(runtime.inputs, session, action_key)
     
     log(f"Now listening for up to {max_duration} seconds...")
     log(f"Checking for sounds every {CHUNK_DURATION}s in real-time")
     log(">> ACTIVELY MONITORING FOR 2 SOUNDS <<")
-    log(f"  [1] Target sound (target.wav) → Will press '{ACTION_KEY}' to end action")
+    log(f"  [1] Target sound (target.wav) → Will press '{action_key}' to end action")
     log(f"  [2] Out-of-range sound (out-of-range.wav) → Action ends automatically")
     
-    start_time = time.time()
+    start_time = clock.time()
     chunk_count = 0
     
     log("Starting audio capture loop...")
     
     try:
         while True:
-            elapsed = time.time() - start_time
+            elapsed = clock.time() - start_time
+            if stop_event.is_set():
+                close_stream(runtime, stream)
+                return None, elapsed, None
             if elapsed >= max_duration:
                 log(f"Timeout: {max_duration}s elapsed without detection")
-                stream.stop_stream()
-                stream.close()
-                return None, elapsed
+                close_stream(runtime, stream)
+                return None, elapsed, None
             
             try:
                 data = stream.read(chunk_samples, exception_on_overflow=False)
             except OSError as e:
                 log(f"OSError reading audio: {e}")
                 log("This may mean no audio is playing or the device is not sending data.")
-                time.sleep(0.1)
+                clock.wait(stop_event, 0.1)
                 continue
             except Exception as e:
                 log(f"Warning: Error reading audio chunk: {e}")
-                time.sleep(0.1)
+                clock.wait(stop_event, 0.1)
                 continue
             
             if not data or len(data) == 0:
                 log("Warning: Received empty audio data")
-                time.sleep(0.1)
+                clock.wait(stop_event, 0.1)
                 continue
             
             # Convert to numpy array
@@ -263,121 +545,132 @@ def record_and_detect_realtime(p, device_index, target_audio, out_of_range_audio
             if device_channels == 2:
                 chunk_audio = chunk_audio.reshape(-1, 2).mean(axis=1)
             
-            audio_buffer.extend(chunk_audio)
+            detector.feed(chunk_audio)
             
             chunk_count += 1
             
             if chunk_count % int(2.0 / CHUNK_DURATION) == 0:
-                log(f"  Still listening... {elapsed:.1f}s elapsed (buffer: {len(audio_buffer)/sample_rate:.1f}s)")
+                log(f"  Still listening... {elapsed:.1f}s elapsed (buffer: {detector.buffered:.1f}s)")
             
-            buffer_array = np.array(audio_buffer)
+            # Score both templates concurrently on the shared detection pool
+            jobs = detector.submit(runtime.pool)
             
-            if len(audio_buffer) >= len(target_audio):
-                found_target, score_target = detect_sound_in_buffer(buffer_array, target_audio, THRESHOLD)
+            if "target" in jobs:
+                found_target, score_target = jobs["target"].result()
                 
                 if found_target:
-                    elapsed = time.time() - start_time
+                    detected_at = time.perf_counter()
+                    elapsed = clock.time() - start_time
                     log(f"")
                     log(f"{'='*60}")
                     log(f"🐟 TARGET SOUND DETECTED!")
                     log(f"{'='*60}")
                     log(f"Detection Score: {score_target:.3f}")
                     log(f"Time to detection: {elapsed:.2f}s")
-                    stream.stop_stream()
-                    stream.close()
-                    return 'target', elapsed
+                    close_stream(runtime, stream)
+                    return 'target', elapsed, detected_at
             
-            if len(audio_buffer) >= len(out_of_range_audio):
-                found_oor, score_oor = detect_sound_in_buffer(buffer_array, out_of_range_audio, THRESHOLD)
+            if "out_of_range" in jobs:
+                found_oor, score_oor = jobs["out_of_range"].result()
                 
                 if found_oor:
-                    elapsed = time.time() - start_time
+                    detected_at = time.perf_counter()
+                    elapsed = clock.time() - start_time
                     log(f"")
                     log(f"{'='*60}")
                     log(f"❌ OUT-OF-RANGE SOUND DETECTED!")
                     log(f"{'='*60}")
                     log(f"Detection Score: {score_oor:.3f}")
                     log(f"Time to detection: {elapsed:.2f}s")
-                    stream.stop_stream()
-                    stream.close()
-                    return 'out_of_range', elapsed
+                    close_stream(runtime, stream)
+                    return 'out_of_range', elapsed, detected_at
     
     except KeyboardInterrupt:
         log("Keyboard interrupt received")
-        stream.stop_stream()
-        stream.close()
+        close_stream(runtime, stream)
         raise
     except Exception as e:
         log(f"Unexpected error in audio loop: {e}")
         import traceback
         traceback.print_exc()
-        stream.stop_stream()
-        stream.close()
-        return None, 0
+        close_stream(runtime, stream)
+        return None, 0, None
+
+def run_session(runtime, name):
+    """
+    Run the cast → listen → reel → wait loop for one game client until runtime.stop_event is set
+    Returns: the session's SessionStats
+    """
+    config = runtime.config
+    clock = runtime.clock
+    inputs = runtime.inputs
+    stop_event = runtime.stop_event
+    settings = config.settings
+    session = find_session(settings, name)
+    templates = config.templates
+    action_key = session["ACTION_KEY"]
+    lure_key = session["LURE_KEY"]
+    use_lure = session["USE_LURE"]
 
-def main():
-    log("="*60)
-    log("REAL-TIME DUAL AUDIO DETECTION PROGRAM")
-    log("="*60)
-    
-    # Load both audio files
-    target_audio, target_sr = load_target_audio(TARGET_FILE)
-    out_of_range_audio, oor_sr = load_target_audio(OUT_OF_RANGE_FILE)
-    
-    # Ensure both files have the same sample rate
-    if target_sr != oor_sr:
-        log(f"WARNING: Sample rates differ! Target: {target_sr} Hz, Out-of-range: {oor_sr} Hz")
-        log(f"Resampling out-of-range audio to {target_sr} Hz...")
-        out_of_range_audio = librosa.resample(out_of_range_audio, orig_sr=oor_sr, target_sr=target_sr)
-        log(f"Resampling complete")
-    
-    sample_rate = target_sr
-    
-    # Initialize PyAudio with WASAPI
-    log("Initializing PyAudio with WASAPI loopback support...")
-    p = pyaudio.PyAudio()
-    
     log(f"Configuration:")
-    log(f"  - Device Index: {OUTPUT_DEVICE_INDEX}")
+    log(f"  - Device Index: {session['OUTPUT_DEVICE_INDEX']}")
+    log(f"  - Window Title: {session['WOW_TITLE_REGEX']}")
     log(f"  - Listen Duration: {LISTEN_DURATION}s per cycle")
+    log(f"  - Adaptive timing: {'on' if settings['ADAPTIVE_TIMING'] else 'off'}")
     log(f"  - Real-time Check Interval: {CHUNK_DURATION}s")
-    log(f"  - Detection Threshold: {THRESHOLD}")
-    log(f"  - Sample Rate: {sample_rate} Hz")
-    log(f"  - Wait after target found: {WAIT_AFTER_TARGET_FOUND[0]}-{WAIT_AFTER_TARGET_FOUND[1]}s (random)")
-    log(f"  - Wait after out-of-range: {WAIT_AFTER_OUT_OF_RANGE[0]}-{WAIT_AFTER_OUT_OF_RANGE[1]}s (random)")
-    log(f"  - Wait after not found: {WAIT_AFTER_NOT_FOUND[0]}-{WAIT_AFTER_NOT_FOUND[1]}s (random)")
+    log(f"  - Detection Engine: {settings['DETECTION_ENGINE']}")
+    log(f"  - Detection Threshold: {settings['THRESHOLD']} (waveform), {settings['SPECTRAL_THRESHOLD']} (spectral)")
+    log(f"  - Correlation backend: {settings['CORRELATION_BACKEND']}")
+    log(f"  - Coarse search: 1/{settings['COARSE_FACTOR']} rate, {settings['COARSE_CANDIDATES']} candidates (1 = full search)")
+    log(f"  - Noise whitening: {'on' if settings['WHITENING'] else 'off'} (waveform engine, "
+        f"threshold {settings['WHITENED_THRESHOLD']} once whitened)")
+    log(f"  - Sample Rate: {templates.sample_rate} Hz")
+    log(f"  - Wait after target found: {settings['WAIT_AFTER_TARGET_FOUND'][0]}-{settings['WAIT_AFTER_TARGET_FOUND'][1]}s (random)")
+    log(f"  - Wait after out-of-range: {settings['WAIT_AFTER_OUT_OF_RANGE'][0]}-{settings['WAIT_AFTER_OUT_OF_RANGE'][1]}s (random)")
+    log(f"  - Wait after not found: {settings['WAIT_AFTER_NOT_FOUND'][0]}-{settings['WAIT_AFTER_NOT_FOUND'][1]}s (random)")
     log(f"  - Lure Interval: {LURE_COOLDOWN_SECONDS} seconds (applied at start of cycle when due)")
+    log(f"  - Watching {config.path} and sound files for changes (applied between cycles)")
     log("")
     log("FLOW:")
-    if USE_LURE:
-        log(f"  1. At the start of the cycle press '{LURE_KEY}' to apply lure")
-        log(f"     Then, every 10m elapsed, apply the lure with '{LURE_KEY}' again")
+    if use_lure:
+        log(f"  1. At the start of the cycle press '{lure_key}' to apply lure")
+        log(f"     Then, every 10m elapsed, apply the lure with '{lure_key}' again")
     else:
         log("  1. Lure disabled (USE_LURE=false)")
-    log(f"  2. Start listening → Press '{ACTION_KEY}' to begin action")
-    log(f"  3. If target sound → Press '{ACTION_KEY}' to end action")
-    log(f"  4. If out-of-range → Action ends automatically (no '{ACTION_KEY}')")
+    log(f"  2. Start listening → Press '{action_key}' to begin action")
+    log(f"  3. If target sound → Press '{action_key}' to end action")
+    log(f"  4. If out-of-range → Action ends automatically (no '{action_key}')")
     log("="*60)
     
+    iteration = 0
+    target_count = 0
+    out_of_range_count = 0
+    no_sound_count = 0
+    last_lure_time = None
+    stats = SessionStats()
+    schedule = AdaptiveSchedule(stats, LISTEN_DURATION)
+    noise_profiles = {}  # ambient noise per device sample rate, learnt across cycles
+    
     try:
-        iteration = 0
-        target_count = 0
-        out_of_range_count = 0
-        no_sound_count = 0
-        last_lure_time = None
-            
-        while True:
+        while not stop_event.is_set():
             iteration += 1
+            cycle_start = clock.time()
+            
+            # Swap in edited settings/templates before the cycle starts, never during it
+            settings = config.poll()
+            session = find_session(settings, name)
+            action_key = session["ACTION_KEY"]
+            lure_key = session["LURE_KEY"]
+            use_lure = session["USE_LURE"]
             
-            if USE_LURE and (last_lure_time is None or (time.time() - last_lure_time) >= LURE_COOLDOWN_SECONDS):
+            if use_lure and (last_lure_time is None or (clock.time() - last_lure_time) >= LURE_COOLDOWN_SECONDS):
                 log("")
                 log(f"🪱 Using lure now")
-                focus_wow_window()
-                press_key(LURE_KEY)
-                last_lure_time = time.time()
+                focus_and_press(inputs, session, lure_key)
+                last_lure_time = clock.time()
                 wait_time = random_wait(LURE_WAIT_TIME)
                 log(f"⌛ Waiting {wait_time:.2f} seconds to finish lure cast")
-                time.sleep(wait_time)  # small buffer so the game registers it clean
+                clock.wait(stop_event, wait_time)  # small buffer so the game registers it clean
                 log("Cast complete, starting next cycle")
             
             log("")
@@ -385,60 +678,125 @@ def main():
             log(f"🎣 CYCLE #{iteration} - STARTING")
             log(f"{'='*60}")
             
+            listen_limit, full_window = schedule.listen_duration(settings)
+            phase = schedule.phase
+            
             # Start listening, which will press ACTION_KEY inside
-            detection_type, elapsed = record_and_detect_realtime(
-                p, OUTPUT_DEVICE_INDEX, target_audio, out_of_range_audio, sample_rate, LISTEN_DURATION
+            detection_type, elapsed, detected_at = record_and_detect_realtime(
+                runtime, settings, session, listen_limit, noise_profiles
             )
+            if stop_event.is_set():
+                break
+            schedule.observe(detection_type, settings)
             
             if detection_type == 'target':
                 # Target sound found - press ACTION_KEY to END action, then wait random time
                 target_count += 1
                 log("")
-                log(f"🐟 ACTION: Target detected → Setting WoW as the active application")
-                
-                focus_wow_window()
-                    
-                log(f"🐟 Pressing '{ACTION_KEY}' to reel in the fish")
-                press_key(ACTION_KEY)
+                log(f"🐟 ACTION: Target detected → Pressing '{action_key}' to reel in the fish")
+                pressed_at = focus_and_press(inputs, session, action_key)
+                latency = pressed_at - detected_at
+                stats.record_latency(latency)
+                log(f"⏱ Detect → keypress latency: {latency * 1000:.1f} ms")
                 
-                wait_time = random_wait(WAIT_AFTER_TARGET_FOUND)
+                wait_time = schedule.wait_time("WAIT_AFTER_TARGET_FOUND", settings)
                 log(f"⌛ Waiting {wait_time:.2f} seconds before next cycle...")
                 
-                time.sleep(wait_time)
+                clock.wait(stop_event, wait_time)
                 log("Wait complete. Starting next cycle...")
                     
             elif detection_type == 'out_of_range':
-                # Out-of-range sound found - action ends automatically, NO '{ACTION_KEY}' press
+                # Out-of-range sound found - action ends automatically, NO ACTION_KEY press
                 out_of_range_count += 1
                 log("")
-                log(f"❌ ACTION: Out-of-range detected → Action ended automatically (no '{ACTION_KEY}' press)")
+                log(f"❌ ACTION: Out-of-range detected → Action ended automatically (no '{action_key}' press)")
                 
-                wait_time = random_wait(WAIT_AFTER_OUT_OF_RANGE)
+                wait_time = schedule.wait_time("WAIT_AFTER_OUT_OF_RANGE", settings)
                 log(f"⌛ Waiting {wait_time:.2f} seconds before next cycle...")
                 
-                time.sleep(wait_time)
+                clock.wait(stop_event, wait_time)
                 log("Wait complete. Starting next cycle...")
                 
             else:
                 # No sound found - wait random time and retry
                 no_sound_count += 1
                 log("")
-                wait_time = random_wait(WAIT_AFTER_NOT_FOUND)
+                wait_time = schedule.wait_time("WAIT_AFTER_NOT_FOUND", settings)
                 log(f"🔇 ACTION: No sound detected → ⌛ Waiting {wait_time:.2f}s before retry")
                 
-                time.sleep(wait_time)
+                clock.wait(stop_event, wait_time)
                 log("Retrying now...")
-                
-    except KeyboardInterrupt:
+            
+            stats.record(detection_type, elapsed, listen_limit, full_window, phase, clock.time() - cycle_start)
+            if iteration % STATS_REPORT_EVERY == 0:
+                log(f"📊 {schedule.describe(settings)}")
+                for line in stats.summary():
+                    log(f"📊 {line}")
+    finally:
         log("")
         log("="*60)
-        log("PROGRAM STOPPED by user (Ctrl+C)")
+        log(f"SESSION STOPPED: {name}")
         log("🎣 Cycles: " + str(iteration))
         log("🐟 Fish caught: " + str(target_count))
         log("❌ Out-of-range events: " + str(out_of_range_count))
         log("🔇 No sound events: " + str(no_sound_count))
+        for line in stats.summary():
+            log("📊 " + line)
         log("="*60)
+    return stats
+
+def run_sessions(runtime):
+    """Run every configured session until Ctrl+C (one thread per session if there are several)"""
+    sessions = runtime.config.settings["SESSIONS"]
+    log(f"Sessions: {len(sessions)} ({', '.join(sess['NAME'] for sess in sessions)})")
+    threads = []
+    
+    try:
+        if len(sessions) == 1:
+            run_session(runtime, sessions[0]["NAME"])
+        else:
+            # One capture/control thread per game client
+            for session in sessions:
+                t = threading.Thread(
+                    target=run_session,
+                    args=(runtime, session["NAME"]),
+                    name=session["NAME"],
+                    daemon=True,
+                )
+                t.start()
+                threads.append(t)
+            while any(t.is_alive() for t in threads):
+                for t in threads:
+                    t.join(timeout=0.5)
+                
+    except KeyboardInterrupt:
+        log("")
+        log("PROGRAM STOPPED by user (Ctrl+C)")
+    finally:
+        runtime.stop_event.set()
+        for t in threads:
+            t.join()
+
+def main():
+    # Windows-only; imported here so the rest of this module also loads elsewhere (e.g. simulator.py)
+    import pyaudiowpatch as pyaudio
+    
+    log("="*60)
+    log("REAL-TIME DUAL AUDIO DETECTION PROGRAM")
+    log("="*60)
+    
+    # Load settings and both audio files once; every session shares them
+    config = ConfigWatcher(SETTINGS_FILE)
+    
+    # Initialize PyAudio with WASAPI
+    log("Initializing PyAudio with WASAPI loopback support...")
+    p = pyaudio.PyAudio()
+    runtime = Runtime(config, p, DesktopInput())
+    
+    try:
+        run_sessions(runtime)
     finally:
+        runtime.close()
         p.terminate()
         log("PyAudio terminated. Program ended.")
 
@@ -0,0 +1,106 @@
+import threading
+import time
+
+class InputBackend:
+    """
+    Focuses game windows and presses keys.
+    focus_and_press() holds a lock for the whole focus + press, because both
+    are global to the desktop and sessions must not interleave them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def focus(self, title_regex):
+        """Bring the window to the foreground; returns False if it already was"""
+        raise NotImplementedError
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def focus_and_press(self, title_regex, key):
+        """Returns: (was_focused_now, time.perf_counter() right after the key press)"""
+        with self._lock:
+            focused = self.focus(title_regex)
+            self.press(key)
+            return focused, time.perf_counter()
+
+class DesktopInput(InputBackend):
+    """
+    pywinauto for window focus, pyautogui for keys.
+    Resolved windows are cached per title regex; a lookup only runs again when
+    using the cached window fails (e.g. the client was restarted).
+    """
+
+    def __init__(self):
+        super().__init__()
+        import pyautogui
+        import pywintypes
+        from pywinauto import Desktop
+        from pywinauto.controls.hwndwrapper import InvalidWindowHandle
+        from pywinauto.findwindows import ElementNotFoundError
+        self._pyautogui = pyautogui
+        self._desktop = Desktop(backend="win32")
+        self._windows = {}
+        # What using a window that went away raises; anything else is a real error
+        self._stale_errors = (ElementNotFoundError, InvalidWindowHandle, pywintypes.error)
+
+    def _window(self, title_regex):
+        window = self._windows.get(title_regex)
+        if window is None:
+            window = self._desktop.window(title_re=title_regex).wrapper_object()
+            self._windows[title_regex] = window
+        return window
+
+    def _focus_window(self, window):
+        # has_focus() compares the handle with the desktop's foreground window;
+        # is_active() only reports the window thread's own active window, which
+        # a background client can still claim
+        if window.has_focus():
+            return False
+        # Focus WoW window without moving the mouse permanently.
+        pos = self._pyautogui.position()
+        window.set_focus()
+        self._pyautogui.moveTo(pos.x, pos.y, duration=0, _pause=False)  # no PAUSE before the key press
+        return True
+
+    def focus(self, title_regex):
+        try:
+            return self._focus_window(self._window(title_regex))
+        except self._stale_errors:
+            # Stale handle - look the window up again and retry once
+            self._windows.pop(title_regex, None)
+            return self._focus_window(self._window(title_regex))
+
+    def press(self, key):
+        self._pyautogui.press(key, _pause=False)  # timestamp right after the key, not after PAUSE
+
+class RecordingInput(InputBackend):
+    """
+    Fake backend that touches no real window or keyboard, for running
+    without a desktop. Every call is appended to `events` as
+    (time.perf_counter(), "focus" | "press", title_regex or key).
+    An optional on_press(key) callback lets a stand-in for the game react.
+    """
+
+    def __init__(self, on_press=None):
+        super().__init__()
+        self.on_press = on_press
+        self.events = []
+        self.focused = None
+
+    def focus(self, title_regex):
+        if self.focused == title_regex:
+            return False
+        self.focused = title_regex
+        self.events.append((time.perf_counter(), "focus", title_regex))
+        return True
+
+    def press(self, key):
+        self.events.append((time.perf_counter(), "press", key))
+        if self.on_press is not None:
+            self.on_press(key)
+
+    def presses(self):
+        """Keys pressed so far, in order"""
+        return [value for _, kind, value in self.events if kind == "press"]
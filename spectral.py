@@ -0,0 +1,111 @@
+import numpy as np
+from scipy import signal
+from numpy.lib.stride_tricks import sliding_window_view
+import librosa
+
+FRAME_DURATION = 0.02  # seconds per STFT frame (rounded up to a power-of-two FFT size)
+HOP_DURATION = 0.01  # seconds between frames
+N_MELS = 40
+LOG_FLOOR = 1e-10  # -100 dB relative to full scale
+INT16_SCALE = 32768.0  # capture loop delivers int16-valued samples
+
+class LogMelStream:
+    """
+    Incremental log-mel spectrogram.
+    feed() only transforms the frames completed by the new samples; the
+    remainder is kept for the next call, so frame boundaries never depend on
+    how the audio was chunked.
+    """
+
+    def __init__(self, sample_rate, max_frames=None):
+        self.n_fft = 1 << int(np.ceil(np.log2(sample_rate * FRAME_DURATION)))
+        self.hop = max(1, int(sample_rate * HOP_DURATION))
+        self.max_frames = max_frames
+        self._window = signal.get_window("hann", self.n_fft).astype(np.float32)
+        self._mel = librosa.filters.mel(sr=sample_rate, n_fft=self.n_fft, n_mels=N_MELS).T
+        self._pending = np.zeros(0, dtype=np.float32)
+        self.frames = np.zeros((0, N_MELS))
+
+    def feed(self, audio):
+        """Append samples; returns the number of new frames"""
+        pending = np.concatenate([self._pending, np.asarray(audio, dtype=np.float32)])
+        if len(pending) < self.n_fft:
+            self._pending = pending
+            return 0
+
+        count = 1 + (len(pending) - self.n_fft) // self.hop
+        windows = sliding_window_view(pending, self.n_fft)[::self.hop][:count]
+        power = np.abs(np.fft.rfft(windows * self._window, axis=1)) ** 2
+        new_frames = np.log(power @ self._mel + LOG_FLOOR)
+        self._pending = pending[count * self.hop:]
+
+        # Rebind rather than modify in place: detection jobs may still hold the old array
+        frames = np.concatenate([self.frames, new_frames])
+        if self.max_frames is not None:
+            frames = frames[-self.max_frames:]
+        self.frames = frames
+        return count
+
+def template_fingerprint(audio, sample_rate):
+    """Log-mel frames of a template, framed exactly like the live stream"""
+    stream = LogMelStream(sample_rate)
+    stream.feed(audio)
+    return stream.frames
+
+def match_frames(frames, fingerprint):
+    """
+    Correlation of the fingerprint against every window of live frames, with
+    each mel band centered over the window. A gain or a stationary background
+    tilt is a per-band constant in the log domain, so neither affects the score.
+    Returns: (score, frame_index)
+    """
+    length = len(fingerprint)
+    if length == 0 or len(frames) < length:
+        return 0.0, 0
+
+    centered = fingerprint - fingerprint.mean(axis=0)
+    numerator = signal.correlate(frames, centered, mode='valid')[:, 0]
+
+    # Per-window, per-band spread of the live frames from running sums
+    sums = np.concatenate([np.zeros((1, frames.shape[1])), np.cumsum(frames, axis=0)])
+    squares = np.concatenate([np.zeros((1, frames.shape[1])), np.cumsum(frames ** 2, axis=0)])
+    window_sum = sums[length:] - sums[:-length]
+    window_square = squares[length:] - squares[:-length]
+    spread = np.sqrt(np.maximum(window_square - window_sum ** 2 / length, 0.0).sum(axis=1))
+
+    scores = numerator / (spread * np.sqrt(np.sum(centered ** 2)) + 1e-10)
+    index = int(np.argmax(scores))
+    return float(scores[index]), index
+
+class SpectralDetector:
+    """
+    Detection engine working on log-mel frames instead of raw samples.
+    A 3 s buffer is ~300 frames of 40 bands, so matching compares a few
+    thousand values per template instead of the full waveform.
+    """
+
+    def __init__(self, fingerprints, sample_rate, threshold, buffer_duration):
+        self.fingerprints = fingerprints
+        self.threshold = threshold
+        self.stream = LogMelStream(sample_rate, max_frames=int(buffer_duration / HOP_DURATION))
+
+    @property
+    def buffered(self):
+        """Seconds of audio currently held"""
+        return len(self.stream.frames) * HOP_DURATION
+
+    def feed(self, chunk):
+        self.stream.feed(chunk / INT16_SCALE)
+
+    def _score(self, frames, fingerprint):
+        score, _ = match_frames(frames, fingerprint)
+        return score >= self.threshold, score
+
+    def submit(self, pool):
+        """Queue scoring of every template with enough frames; returns {name: future}"""
+        frames = self.stream.frames
+        return {
+            name: pool.submit(self._score, frames, fingerprint)
+            for name, fingerprint in self.fingerprints.items()
+            if len(frames) >= len(fingerprint)
+        }
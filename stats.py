@@ -0,0 +1,194 @@
+import random
+import numpy as np
+
+# Fraction of a wait range the adaptive ceiling moves down after each catch;
+# an empty cast moves it back up WAIT_BACKOFF times as far
+WAIT_TUNE_STEP = 0.1
+WAIT_BACKOFF = 3
+
+class SessionStats:
+    """
+    Outcome and cast-to-bite time of every cycle, tagged with the timing phase
+    ("fixed" or "adaptive") it ran under, so throughput can be compared.
+    """
+
+    def __init__(self):
+        self.cycles = []
+        self.latencies = []
+
+    def record_latency(self, seconds):
+        """Time from a detection to the key press reacting to it"""
+        self.latencies.append(seconds)
+
+    def record(self, outcome, elapsed, listen_limit, full_window, phase, duration):
+        """
+        outcome: 'target', 'out_of_range' or None (timeout)
+        elapsed: seconds from cast to detection (or to the timeout)
+        full_window: the cycle listened for the whole LISTEN_DURATION
+        duration: wall time of the whole cycle including lure and wait
+        """
+        self.cycles.append({
+            "outcome": outcome,
+            "elapsed": elapsed,
+            "listen_limit": listen_limit,
+            "full_window": full_window,
+            "phase": phase,
+            "duration": duration,
+        })
+
+    def bite_times(self, full_window_only=False):
+        """Cast-to-bite seconds of every catch"""
+        return [
+            c["elapsed"] for c in self.cycles
+            if c["outcome"] == "target" and (c["full_window"] or not full_window_only)
+        ]
+
+    def full_window_cycles(self):
+        """Cycles that listened for the whole window - the only unbiased view of bite times"""
+        return [c for c in self.cycles if c["full_window"]]
+
+    def catches_per_hour(self, phase):
+        """Returns: (catches_per_hour, cycles, catches, hours) for one phase"""
+        cycles = [c for c in self.cycles if c["phase"] == phase]
+        hours = sum(c["duration"] for c in cycles) / 3600
+        catches = sum(1 for c in cycles if c["outcome"] == "target")
+        rate = catches / hours if hours > 0 else 0.0
+        return rate, len(cycles), catches, hours
+
+    def summary(self):
+        """Log lines describing bite times and throughput per phase"""
+        lines = []
+        bites = self.bite_times()
+        if bites:
+            p50, p95 = np.percentile(bites, [50, 95])
+            lines.append(f"Bite time: median {p50:.1f}s, p95 {p95:.1f}s, max {max(bites):.1f}s ({len(bites)} bites)")
+        if self.latencies:
+            p50, p95 = np.percentile(self.latencies, [50, 95]) * 1000
+            lines.append(f"Detect → keypress: median {p50:.1f} ms, p95 {p95:.1f} ms, "
+                         f"max {max(self.latencies) * 1000:.1f} ms ({len(self.latencies)} presses)")
+        rates = {}
+        for phase in ("fixed", "adaptive"):
+            rate, cycles, catches, hours = self.catches_per_hour(phase)
+            if cycles:
+                rates[phase] = rate
+                lines.append(f"{phase.capitalize()} timing: {catches} fish in {cycles} cycles over "
+                             f"{hours * 60:.1f} min → {rate:.1f} fish/hour")
+        if rates.get("fixed") and "adaptive" in rates:
+            gain = (rates["adaptive"] / rates["fixed"] - 1) * 100
+            lines.append(f"Adaptive vs fixed (interleaved probe casts): {gain:+.1f}% fish/hour")
+        return lines
+
+class AdaptiveSchedule:
+    """
+    Listen window and waits for the next cycle.
+    With ADAPTIVE_TIMING off (or before ADAPTIVE_MIN_SAMPLES bites were seen
+    with the full window) this is the fixed behaviour: listen for the full
+    window and draw waits uniformly from the configured ranges.
+
+    Once active, the listen window ends where the estimated catches per hour
+    peak (see best_listen_limit), but never before ADAPTIVE_LISTEN_PERCENTILE
+    of the observed bite times plus ADAPTIVE_LISTEN_MARGIN. Only full-window
+    casts feed the estimate - a cut-off cast never sees a late bite, so
+    learning from it would shrink the window cycle after cycle. Every
+    ADAPTIVE_PROBE_EVERY-th cast therefore still runs the fixed timing (full
+    window and untuned wait); these probes are the interleaved "fixed" control
+    group that the adaptive cycles are compared against.
+
+    Waits are drawn from [min, ceiling]; the ceiling steps toward min after
+    each catch and back toward max, faster, when the next cast yields nothing.
+    """
+
+    def __init__(self, stats, full_duration):
+        self.stats = stats
+        self.full_duration = full_duration
+        self._casts = 0
+        self._ceilings = {}
+        self._last_wait = None
+        self._control = True
+
+    def active(self, settings):
+        return (settings["ADAPTIVE_TIMING"]
+                and len(self.stats.bite_times(full_window_only=True)) >= settings["ADAPTIVE_MIN_SAMPLES"])
+
+    def listen_duration(self, settings):
+        """
+        Returns: (seconds to listen for the next cast, is_full_window)
+        Also decides whether this cycle runs the fixed timing (see phase)
+        """
+        self._casts += 1
+        probe_every = settings["ADAPTIVE_PROBE_EVERY"]
+        self._control = not self.active(settings) or bool(probe_every and self._casts % probe_every == 0)
+        if self._control:
+            return self.full_duration, True
+        limit = self.best_listen_limit(settings)
+        return limit, limit >= self.full_duration
+
+    def best_listen_limit(self, settings):
+        """
+        Listen window (0.1 s steps) with the most estimated catches per hour.
+        Every full-window cycle is replayed at each candidate window: a bite
+        or out-of-range sound heard before the window ends keeps its outcome
+        and duration, anything later becomes a timeout at the window. The
+        time outside the listen window (lure, waits) is kept as observed.
+        Cutting the window only pays off when empty casts are common, so with
+        few timeouts this stays at or near the full window.
+        Candidates start at ADAPTIVE_LISTEN_PERCENTILE of bite times + margin.
+        """
+        margin = settings["ADAPTIVE_LISTEN_MARGIN"]
+        cycles = self.stats.full_window_cycles()
+        bites = self.stats.bite_times(full_window_only=True)
+        floor = min(np.percentile(bites, settings["ADAPTIVE_LISTEN_PERCENTILE"]) + margin, self.full_duration)
+
+        elapsed = np.array([c["elapsed"] for c in cycles])
+        heard = np.array([c["outcome"] is not None for c in cycles])
+        caught = np.array([c["outcome"] == "target" for c in cycles])
+        outside = np.array([c["duration"] - c["elapsed"] for c in cycles])
+
+        candidates = np.round(np.append(elapsed[caught] + margin, self.full_duration), 1)
+        candidates = np.unique(np.clip(candidates, round(float(floor), 1), self.full_duration))[:, None]
+        in_window = heard & (elapsed <= candidates)
+        catches = (in_window & caught).sum(axis=1)
+        hours = (outside + np.where(in_window, elapsed, candidates)).sum(axis=1) / 3600
+        rates = catches / np.maximum(hours, 1e-9)
+        # Ties go to the longer window: nothing to gain from cutting, only late bites to lose
+        best = len(rates) - 1 - int(np.argmax(rates[::-1]))
+        return float(candidates[best, 0])
+
+    @property
+    def phase(self):
+        """'fixed' for warm-up and probe cycles, 'adaptive' otherwise (valid after listen_duration)"""
+        return "fixed" if self._control else "adaptive"
+
+    def observe(self, outcome, settings):
+        """Tune the ceiling of the wait that preceded the cast that just ended"""
+        if self._last_wait is None or not settings["ADAPTIVE_TIMING"]:
+            return
+        name = self._last_wait
+        low, high = settings[name]
+        ceiling = min(self._ceilings.get(name, high), high)
+        if outcome == "target":
+            ceiling = max(low, ceiling - WAIT_TUNE_STEP * (high - low))
+        elif outcome is None:
+            ceiling = min(high, ceiling + WAIT_BACKOFF * WAIT_TUNE_STEP * (high - low))
+        self._ceilings[name] = ceiling
+
+    def wait_time(self, name, settings):
+        """Random wait for the range setting `name`, within the tuned ceiling on adaptive cycles"""
+        low, high = settings[name]
+        self._last_wait = name
+        if not self._control and self.active(settings):
+            high = max(low, min(self._ceilings.get(name, high), high))
+        return random.uniform(low, high)
+
+    def describe(self, settings):
+        """One line for the log about the current timing"""
+        if not settings["ADAPTIVE_TIMING"]:
+            return "Adaptive timing off"
+        bites = self.stats.bite_times(full_window_only=True)
+        if not self.active(settings):
+            return f"Adaptive timing learning: {len(bites)}/{settings['ADAPTIVE_MIN_SAMPLES']} full-window bites"
+        ceilings = ", ".join(f"{name} ≤ {value:.2f}s" for name, value in sorted(self._ceilings.items()))
+        return (f"Adaptive timing active: listen {self.best_listen_limit(settings):.1f}s "
+                f"(best estimated fish/hour from {len(bites)} full-window bites, at least "
+                f"p{settings['ADAPTIVE_LISTEN_PERCENTILE']:g} + {settings['ADAPTIVE_LISTEN_MARGIN']:g}s)"
+                + (f"; waits {ceilings}" if ceilings else ""))
@@ -0,0 +1,185 @@
+import numpy as np
+from collections import deque
+from scipy import signal
+from detection import WaveformDetector, detect_sound_in_buffer, find_peak
+
+FILTER_DURATION = 0.02  # seconds of FIR taps (rounded up to a power of two)
+PSD_FLOOR = 1e-4  # bands quieter than this fraction of the loudest one are not boosted further
+NOISE_SMOOTHING = 0.3  # weight of the newest estimate in the running noise spectrum
+QUIET_RATIO = 0.5  # a tick is quiet when every score is below this fraction of its threshold
+CHECK_DURATION = 3.0  # seconds of the latest quiet audio used to check whether whitening helps a template
+
+def filter_taps(sample_rate):
+    """Length of the whitening FIR at this sample rate"""
+    return 1 << int(np.ceil(np.log2(sample_rate * FILTER_DURATION)))
+
+class NoiseProfile:
+    """
+    Running estimate of the ambient noise spectrum of one audio source and the
+    whitening filter derived from it.
+    add_quiet() collects audio known to hold no game sound; every
+    `update_duration` seconds of it the spectrum is re-estimated, the FIR is
+    rebuilt and `version` increases. Whitened templates are cached per version.
+
+    Whitening does not help every template: for a short one, the flatter
+    background can score higher against it than the raw background did.
+    whitened_templates() therefore checks each template on the latest quiet
+    audio and leaves it unwhitened (None) where the separation drops.
+    """
+
+    def __init__(self, sample_rate, update_duration):
+        self.sample_rate = sample_rate
+        self.update_duration = update_duration
+        self.taps = filter_taps(sample_rate)
+        self.psd = None
+        self.fir = None
+        self.version = 0
+        self._quiet = []
+        self._quiet_samples = 0
+        self._check_audio = None
+        self._templates = {}
+
+    def add_quiet(self, audio):
+        self._quiet.append(audio)
+        self._quiet_samples += len(audio)
+        if self._quiet_samples >= max(self.taps, self.sample_rate * self.update_duration):
+            self._update(np.concatenate(self._quiet))
+            self._quiet = []
+            self._quiet_samples = 0
+
+    def _update(self, audio):
+        _, psd = signal.welch(audio, nperseg=self.taps)
+        self.psd = psd if self.psd is None else (1 - NOISE_SMOOTHING) * self.psd + NOISE_SMOOTHING * psd
+
+        # Zero-phase inverse-amplitude response, centered and windowed into a linear-phase FIR
+        gain = 1 / np.sqrt(np.maximum(self.psd, PSD_FLOOR * self.psd.max()) + 1e-20)
+        fir = np.roll(np.fft.irfft(gain, self.taps), self.taps // 2) * signal.get_window("hann", self.taps)
+        self.fir = fir / np.sqrt(np.sum(fir ** 2))
+        self._check_audio = np.asarray(audio[-int(self.sample_rate * CHECK_DURATION):], dtype=np.float32)
+        self.version += 1
+
+    def filter(self, audio, state=None):
+        """Streaming whitening of live audio. Returns: (float32 audio, state for the next call)"""
+        if state is None:
+            state = np.zeros(len(self.fir) - 1)
+        whitened, state = signal.lfilter(self.fir, 1.0, audio, zi=state)
+        return whitened.astype(np.float32), state
+
+    def whiten(self, audio):
+        """Whole-signal whitening, aligned with the streaming filter (full length, taps - 1 longer)"""
+        return signal.convolve(audio, self.fir).astype(np.float32)
+
+    def separation(self, template):
+        """
+        Score of the template mixed into the latest quiet audio (0 dB) divided
+        by the score of that audio alone, without and with whitening
+        Returns: (raw, whitened)
+        """
+        quiet = self._check_audio
+        if len(quiet) < 2 * len(template):
+            return 0.0, 1.0
+        event = quiet.copy()
+        offset = (len(quiet) - len(template)) // 2
+        event[offset:offset + len(template)] += np.std(quiet) / (np.std(template) + 1e-10) * template
+        whitened_template = self.whiten(template)
+        raw = find_peak(event, template)[0] / (find_peak(quiet, template)[0] + 1e-10)
+        whitened = (find_peak(self.filter(event)[0], whitened_template)[0]
+                    / (find_peak(self.filter(quiet)[0], whitened_template)[0] + 1e-10))
+        return raw, whitened
+
+    def whitened_templates(self, templates):
+        """
+        {name: whitened audio, or None where whitening lowers the separation};
+        each template is checked and filtered once per noise update
+        """
+        result = {}
+        for name, audio in templates.items():
+            cached = self._templates.get(name)
+            if cached is None or cached[0] is not audio or cached[1] != self.version:
+                raw, whitened = self.separation(audio)
+                cached = (audio, self.version, self.whiten(audio) if whitened >= raw else None)
+                self._templates[name] = cached
+            result[name] = cached[2]
+        return result
+
+class WhiteningDetector(WaveformDetector):
+    """
+    Waveform engine with a noise-whitening stage in front of the correlation.
+    Live audio is filtered chunk by chunk (lfilter with carried state) and the
+    templates with the same FIR, so ambient hum or water that dominates a few
+    bands no longer props up the correlation with everything.
+    The raw audio is kept as well: when the noise profile changes, the buffer
+    is re-filtered once with the new FIR instead of mixing two filters, and
+    templates that whitening does not help keep being scored on the raw audio.
+    Raw scores are compared against `threshold`, whitened ones against
+    `whitened_threshold`; until the first estimate exists everything is raw.
+    Ticks scoring well below the threshold feed the noise profile, delayed by
+    a template length so the start of an event is never learnt as noise.
+    """
+
+    def __init__(self, templates, noise, sample_rate, threshold, whitened_threshold, buffer_duration, **search):
+        super().__init__(templates, sample_rate, threshold, buffer_duration, **search)
+        self.whitened_threshold = whitened_threshold
+        self.noise = noise
+        self.raw = deque(maxlen=self.buffer.maxlen)
+        self.whitened = {}  # name -> whitened template, for the templates whitening helps
+        self._version = 0
+        self._state = None
+        self._latest = None
+        self._jobs = {}
+        self._jobs_chunk = None
+        self._pending = deque()
+        self._settle_samples = max(len(audio) for audio in templates.values())
+
+    def _refilter(self):
+        """Re-whiten the raw buffer and the templates with the current FIR"""
+        whitened, self._state = self.noise.filter(np.array(self.raw, dtype=np.float32))
+        self.buffer.clear()
+        self.buffer.extend(whitened)
+        self.whitened = {
+            name: audio for name, audio in self.noise.whitened_templates(self.templates).items()
+            if audio is not None
+        }
+        self._version = self.noise.version
+
+    def feed(self, chunk):
+        self.raw.extend(chunk)
+        self._latest = chunk
+        if self.noise.version != self._version:
+            self._refilter()
+        elif self.noise.fir is None:
+            self.buffer.extend(chunk)
+        else:
+            whitened, self._state = self.noise.filter(chunk, self._state)
+            self.buffer.extend(whitened)
+
+    def _settle(self):
+        """Pass the previous tick's chunk on to the noise profile if that tick was quiet"""
+        if self._jobs_chunk is None:
+            return
+        quiet = bool(self._jobs) and all(
+            future.result()[1] < QUIET_RATIO * threshold for future, threshold in self._jobs.values()
+        )
+        if not quiet:
+            self._pending.clear()
+            return
+        self._pending.append(self._jobs_chunk)
+        while sum(len(c) for c in self._pending) - len(self._pending[0]) >= self._settle_samples:
+            self.noise.add_quiet(self._pending.popleft())
+
+    def submit(self, pool):
+        """Queue scoring of every template that fits, each on the raw or the whitened buffer"""
+        self._settle()
+        raw_array = np.array(self.raw, dtype=np.float32)
+        whitened_array = np.array(self.buffer, dtype=np.float32)
+        self._jobs = {}
+        for name, audio in self.templates.items():
+            if name in self.whitened:
+                buffer_array, audio, threshold = whitened_array, self.whitened[name], self.whitened_threshold
+            else:
+                buffer_array, threshold = raw_array, self.threshold
+            if len(buffer_array) >= len(audio):
+                future = pool.submit(detect_sound_in_buffer, buffer_array, audio, threshold, **self.search)
+                self._jobs[name] = (future, threshold)
+        self._jobs_chunk = self._latest
+        return {name: future for name, (future, _) in self._jobs.items()}